@@ -1,55 +1,281 @@
 import os
-import pandas as pd
-from datetime import datetime, timedelta
+import sys
+import functools
+import numpy as np
+from datetime import datetime
+from offline_score import score_row
 import math
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+try:
+    from pyarrow import ArrowInvalid, feather
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+try:
+    from scipy.spatial import cKDTree
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+try:
+    import numexpr as ne
+    NUMEXPR_AVAILABLE = True
+except ImportError:
+    NUMEXPR_AVAILABLE = False
+
+# Degrees-to-radians factor, hoisted so the compiled kernel sees a constant
+_D2R = math.pi / 180.0
+
 def haversine_distance(lat1, lon1, lat2, lon2):
     """Calculate the great circle distance between two points on the earth (km)"""
     R = 6371  # Earth radius in km
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    delta_phi = math.radians(lat2 - lat1)
-    delta_lambda = math.radians(lon2 - lon1)
-    a = math.sin(delta_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
+    phi1 = lat1 * _D2R
+    phi2 = lat2 * _D2R
+    sin_dphi = math.sin((phi2 - phi1) * 0.5)
+    sin_dlambda = math.sin((lon2 - lon1) * (_D2R * 0.5))
+    a = sin_dphi * sin_dphi + math.cos(phi1) * math.cos(phi2) * sin_dlambda * sin_dlambda
+    # asin(sqrt(a)) == atan2(sqrt(a), sqrt(1 - a)) for a in [0, 1]
+    return 2 * R * math.asin(min(1.0, math.sqrt(a)))
+
+def haversine_vec(lat1, lon1, lat2, lon2):
+    """Great circle distance (km) from one point to arrays of points"""
+    R = 6371  # Earth radius in km
+    phi1 = np.asarray(lat1) * _D2R
+    phi2 = np.asarray(lat2) * _D2R
+    sin_dphi = np.sin((phi2 - phi1) * 0.5)
+    sin_dlambda = np.sin((np.asarray(lon2) - lon1) * (_D2R * 0.5))
+    a = sin_dphi * sin_dphi + np.cos(phi1) * np.cos(phi2) * sin_dlambda * sin_dlambda
+    return 2 * R * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+if NUMBA_AVAILABLE:
+    # Compiled lazily on first call and cached to disk
+    haversine_distance = njit(cache=True, fastmath=True)(haversine_distance)
+
+# Approximate village centroids used for the nearest-village search
+VILLAGE_COORDS = {
+    'Chevella': (17.2, 78.1),
+    'Manchal': (17.1, 78.2),
+    'Shankarpalle': (17.3, 78.0),
+}
+
+# Centroids as parallel arrays indexed by village id; the trailing (0, 0)
+# slot collects villages missing from VILLAGE_COORDS
+_VILLAGE_NAMES = np.array(list(VILLAGE_COORDS))
+_VILLAGE_LAT = np.array([c[0] for c in VILLAGE_COORDS.values()] + [0.0], dtype=np.float64)
+_VILLAGE_LON = np.array([c[1] for c in VILLAGE_COORDS.values()] + [0.0], dtype=np.float64)
+_VILLAGE_ORDER = np.argsort(_VILLAGE_NAMES)
+_VILLAGE_NAMES_SORTED = _VILLAGE_NAMES[_VILLAGE_ORDER]
+
+def _village_ids(names):
+    """Map village names to centroid ids, sending unknown names to the (0, 0) slot"""
+    names = np.asarray(names, dtype=str)
+    pos = np.minimum(np.searchsorted(_VILLAGE_NAMES_SORTED, names), len(_VILLAGE_NAMES_SORTED) - 1)
+    found = _VILLAGE_NAMES_SORTED[pos] == names
+    return np.where(found, _VILLAGE_ORDER[pos], len(_VILLAGE_NAMES)).astype(np.intp)
+
+def _unit_vector(lat, lon):
+    """Convert degrees lat/lon to Cartesian points on the unit sphere"""
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    return np.stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)), axis=-1)
+
+@functools.lru_cache(maxsize=1)
+def _village_tree():
+    """KD-tree over village centroids; chord order matches great circle order"""
+    return cKDTree(_unit_vector(_VILLAGE_LAT, _VILLAGE_LON))
+
+@functools.lru_cache(maxsize=1)
+def _load_cached():
+    """Read the offline dataset once per process, preferring a memory-mapped Arrow copy of the CSV"""
+    import pandas as pd  # deferred so importing this module stays cheap
 
-def load_offline_data():
-    """Load CSV agricultural data for offline analysis"""
     csv_path = os.path.join(os.path.dirname(__file__), '../data/Ranga_Reddy_REAL_Villages_Agricultural_Data_2025.csv')
     if not os.path.exists(csv_path):
         raise FileNotFoundError(f"Offline data CSV not found at {csv_path}")
-    df = pd.read_csv(csv_path, parse_dates=['Date'])
+    # Arrow IPC (Feather v2) keeps Date as a native timestamp, so later runs
+    # skip CSV parsing entirely and map the columns straight from disk
+    feather_path = os.path.splitext(csv_path)[0] + '.feather'
+
+    df = None
+    if PYARROW_AVAILABLE and os.path.exists(feather_path) and os.path.getmtime(feather_path) >= os.path.getmtime(csv_path):
+        try:
+            df = feather.read_table(feather_path, memory_map=True).to_pandas()
+        except (OSError, ArrowInvalid) as e:
+            # A damaged cache is rewritten from the CSV below
+            print(f"Could not read Arrow cache: {e}", file=sys.stderr)
+    if df is None:
+        df = pd.read_csv(csv_path, parse_dates=['Date'])
+        if PYARROW_AVAILABLE:
+            # Written aside and moved into place so concurrent readers never
+            # see a partial file
+            tmp_path = f"{feather_path}.{os.getpid()}.tmp"
+            try:
+                feather.write_feather(df, tmp_path, compression='uncompressed')
+                os.replace(tmp_path, feather_path)
+            except OSError as e:
+                print(f"Could not write Arrow cache: {e}", file=sys.stderr)
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    # Precompute lookup columns so the nearest-village search stays in NumPy.
+    df['_crop_lower'] = df['Crop_Variety'].str.lower().astype('category')
+
+    # Per-village lookup tables are gathered onto rows by category code.
+    # Unknown villages fall back to (0, 0) so they never win the search.
+    df['Village'] = df['Village'].astype('category')
+    villages = df['Village'].cat.categories
+    # A missing village has code -1, which lands on the appended unknown slot
+    # instead of wrapping to the last category
+    village_lut = np.append(_village_ids(villages), len(_VILLAGE_NAMES))
+    village_id = village_lut[df['Village'].cat.codes.values]
+    df['_village_id'] = village_id
+    df['_village_lat'] = _VILLAGE_LAT[village_id]
+    df['_village_lon'] = _VILLAGE_LON[village_id]
     return df
 
+def load_offline_data():
+    """Load CSV agricultural data for offline analysis.
+
+    The frame is shared across calls; take a copy before mutating it.
+    """
+    return _load_cached()
+
 def find_nearest_village_data(df, latitude, longitude, crop_type, date):
     """Find nearest village data for given location, crop type, and date"""
-    village_coords = {
-        'Chevella': (17.2, 78.1),
-        'Manchal': (17.1, 78.2),
-        'Shankarpalle': (17.3, 78.0),
-    }
-    date_range_start = date - timedelta(days=7)
-    date_range_end = date + timedelta(days=7)
-    filtered = df[
-        (df['Crop_Variety'].str.lower() == crop_type.lower()) &
-        (df['Date'] >= date_range_start) &
-        (df['Date'] <= date_range_end)
-    ]
-    if filtered.empty:
+    # +/-7 calendar days around the requested date, compared as int64 day counts
+    date_range_start = np.datetime64(date, 'D') - np.timedelta64(7, 'D')
+    date_range_end = date_range_start + np.timedelta64(14, 'D')
+    # Compare integer category codes instead of strings
+    crops = df['_crop_lower'].cat
+    if crop_type.lower() not in crops.categories:
         return None
+    crop_code = crops.categories.get_loc(crop_type.lower())
 
-    filtered['Distance'] = filtered['Village'].apply(
-        lambda v: haversine_distance(latitude, longitude, *village_coords.get(v, (0,0)))
+    dates = df['Date'].values.astype('datetime64[D]', copy=False)
+    mask = (
+        (crops.codes.values == crop_code) &
+        (dates >= date_range_start) &
+        (dates <= date_range_end)
     )
-    nearest = filtered.loc[filtered['Distance'].idxmin()]
+    positions = np.flatnonzero(mask)
+    if positions.size == 0:
+        return None
+
+    if SCIPY_AVAILABLE:
+        # Walk centroids nearest-first and stop at the first village with matching rows
+        _, order = _village_tree().query(_unit_vector(latitude, longitude), k=len(_VILLAGE_LAT))
+        village_ids = df['_village_id'].values[positions]
+        for village_id in np.atleast_1d(order):
+            hits = positions[village_ids == village_id]
+            if hits.size:
+                return df.iloc[hits[0]]
+
+    distances = haversine_vec(
+        float(latitude), float(longitude),
+        df['_village_lat'].values[positions], df['_village_lon'].values[positions]
+    )
+    nearest = df.iloc[positions[int(np.argmin(distances))]]
     return nearest
 
+# Damage labels indexed by the level returned from offline_score.score_row
+_DAMAGE_CAUSES = ('Healthy', 'Minor Stress', 'Moderate Stress', 'Severe Stress')
+
+# Market value per hectare by crop
+_CROP_VALUES = {
+    'rice': 40000,
+    'wheat': 35000,
+    'cotton': 60000,
+    'sugarcane': 80000,
+    'maize': 30000
+}
+
+# NDVI deficit plus heat/drought/dry-air penalties, capped at 100%.
+# numexpr caches the compiled program and evaluates it in one fused pass.
+_LOSS_EXPR = (
+    "minimum(maximum(0, (thr - ndvi) / thr * 100)"
+    " + where(t > 35, 5, 0) + where(r < 10, 5, 0) + where(h < 30, 3, 0), 100)"
+)
+
+def _score_frame(rows):
+    """Score crop loss column-wise for a DataFrame of offline rows (or a single row)"""
+    ndvi = np.atleast_1d(np.asarray(rows['NDVI_Value'], dtype=np.float64))
+    temp_max = np.atleast_1d(np.asarray(rows['Temperature_Max_C'], dtype=np.float64))
+    rainfall = np.atleast_1d(np.asarray(rows['Rainfall_mm'], dtype=np.float64))
+    humidity = np.atleast_1d(np.asarray(rows['Humidity_Percent'], dtype=np.float64))
+
+    healthy_ndvi_threshold = 0.6
+    if NUMEXPR_AVAILABLE:
+        loss = ne.evaluate(_LOSS_EXPR, local_dict={
+            'ndvi': ndvi, 'thr': healthy_ndvi_threshold, 't': temp_max, 'r': rainfall, 'h': humidity
+        })
+    else:
+        loss = np.maximum(0, (healthy_ndvi_threshold - ndvi) / healthy_ndvi_threshold * 100)
+        loss += np.where(temp_max > 35, 5, 0) + np.where(rainfall < 10, 5, 0) + np.where(humidity < 30, 3, 0)
+        loss = np.minimum(loss, 100)
+
+    damage_cause = np.select(
+        [loss > 40, loss > 25, loss > 10],
+        [_DAMAGE_CAUSES[3], _DAMAGE_CAUSES[2], _DAMAGE_CAUSES[1]],
+        default=_DAMAGE_CAUSES[0]
+    )
+    return loss, damage_cause
+
+def _analyze_batch(df, latitudes, longitudes, crop_type, field_area, base_value, today):
+    """Score the nearest rows of several locations in one column-wise pass"""
+    results = [{
+        'success': False,
+        'error': 'No matching offline data found for location, crop, and date'
+    } for _ in range(len(latitudes))]
+    matched, labels = [], []
+    for i, (latitude, longitude) in enumerate(zip(latitudes, longitudes)):
+        nearest_data = find_nearest_village_data(df, latitude, longitude, crop_type, today)
+        if nearest_data is not None:
+            matched.append(i)
+            labels.append(nearest_data.name)
+    if not matched:
+        return results
+
+    rows = df.loc[labels]
+    loss, causes = _score_frame(rows)
+    # Same recency and area terms as offline_score.score_row
+    age_days = (today - rows['Date']).dt.days.to_numpy()
+    confidence = 80.0 + (5 - np.abs(age_days))
+    affected_area = float(field_area) * (loss / 100)
+    estimated_value = affected_area * float(base_value)
+    for j, i in enumerate(matched):
+        results[i] = {
+            'success': True,
+            'ndvi_value': float(rows['NDVI_Value'].iat[j]),
+            'loss_percentage': float(loss[j]),
+            'confidence': float(confidence[j]),
+            'affected_area': float(affected_area[j]),
+            'estimated_value': float(estimated_value[j]),
+            'damage_cause': str(causes[j]),
+            'data_source': 'offline_csv',
+            'location': rows['Village'].iat[j],
+            'date': rows['Date'].iat[j].strftime('%Y-%m-%d')
+        }
+    return results
+
 def analyze_crop_loss_offline(latitude, longitude, crop_type, field_area):
-    """Analyze crop loss using offline CSV data"""
+    """Analyze crop loss using offline CSV data.
+
+    Sequences of coordinates are scored together and give one result per location.
+    """
+    batch = np.ndim(latitude) > 0
     try:
         df = load_offline_data()
         today = datetime.now()
+        base_value = _CROP_VALUES.get(crop_type.lower(), 40000)
+        if batch:
+            return _analyze_batch(df, latitude, longitude, crop_type, field_area, base_value, today)
         nearest_data = find_nearest_village_data(df, latitude, longitude, crop_type, today)
         if nearest_data is None:
             return {
@@ -57,36 +283,16 @@ def analyze_crop_loss_offline(latitude, longitude, crop_type, field_area):
                 'error': 'No matching offline data found for location, crop, and date'
             }
         ndvi_value = nearest_data['NDVI_Value']
-        healthy_ndvi_threshold = 0.6
-        loss_percentage = max(0, (healthy_ndvi_threshold - ndvi_value) / healthy_ndvi_threshold * 100)
-        temp_max = nearest_data['Temperature_Max_C']
-        rainfall = nearest_data['Rainfall_mm']
-        humidity = nearest_data['Humidity_Percent']
-        if temp_max > 35:
-            loss_percentage += 5
-        if rainfall < 10:
-            loss_percentage += 5
-        if humidity < 30:
-            loss_percentage += 3
-        loss_percentage = min(loss_percentage, 100)
-        confidence = 80 + (5 - abs((today - nearest_data['Date']).days))  # Adjust confidence by data recency
-        damage_cause = "Healthy"
-        if loss_percentage > 40:
-            damage_cause = "Severe Stress"
-        elif loss_percentage > 25:
-            damage_cause = "Moderate Stress"
-        elif loss_percentage > 10:
-            damage_cause = "Minor Stress"
-        affected_area = field_area * (loss_percentage / 100)
-        crop_values = {
-            'rice': 40000,
-            'wheat': 35000,
-            'cotton': 60000,
-            'sugarcane': 80000,
-            'maize': 30000
-        }
-        base_value = crop_values.get(crop_type.lower(), 40000)
-        estimated_value = affected_area * base_value
+        loss_percentage, confidence, affected_area, estimated_value, level = score_row(
+            float(ndvi_value),
+            float(nearest_data['Temperature_Max_C']),
+            float(nearest_data['Rainfall_mm']),
+            float(nearest_data['Humidity_Percent']),
+            int((today - nearest_data['Date']).days),
+            float(field_area),
+            float(base_value)
+        )
+        damage_cause = _DAMAGE_CAUSES[level]
         return {
             'success': True,
             'ndvi_value': float(ndvi_value),
@@ -100,7 +306,8 @@ def analyze_crop_loss_offline(latitude, longitude, crop_type, field_area):
             'date': nearest_data['Date'].strftime('%Y-%m-%d')
         }
     except Exception as e:
-        return {
+        error = {
             'success': False,
             'error': str(e)
         }
+        return [error] * len(latitude) if batch else error
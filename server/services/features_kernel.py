@@ -0,0 +1,99 @@
+"""
+Feature construction shared by the offline crop trainer and predictors.
+
+Both build the same 16 columns (raw weather, date, category codes, stress
+flags and derived temperature features) and report importances over them.
+With numba installed the kernels are compiled and cached next to this file;
+otherwise NumPy equivalents run.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Column order of every row built here (the model's feature_columns)
+FEATURE_COLUMNS = (
+    'NDVI_Value', 'Temperature_Min_C', 'Temperature_Max_C',
+    'Humidity_Percent', 'Rainfall_mm', 'Wind_Speed_kmh',
+    'Month', 'Day', 'Crop_Encoded', 'Mandal_Encoded', 'Village_Encoded',
+    'Heat_Stress', 'Drought_Stress', 'High_Wind_Stress',
+    'Temp_Range', 'Avg_Temp'
+)
+
+# Heat (Temperature_Max_C > 35), drought (Rainfall_mm < 5), wind (Wind_Speed_kmh > 20)
+STRESS_SIGNS = np.array([1.0, -1.0, 1.0])
+STRESS_THRESHOLDS = np.array([35.0, -5.0, 20.0])
+
+def normalized_importances(model):
+    """Feature importances scaled to sum to 1 (LightGBM reports raw gains)"""
+    importances = np.asarray(model.feature_importances_, dtype=np.float64)
+    total = importances.sum()
+    return importances / total if total > 0 else importances
+
+def build_feature_row(ndvi, tmin, tmax, humid, rain, wind, month, day, crop, mandal, village):
+    """Single-sample feature row in FEATURE_COLUMNS order"""
+    out = np.empty(16, dtype=np.float64)
+    out[0] = ndvi
+    out[1] = tmin
+    out[2] = tmax
+    out[3] = humid
+    out[4] = rain
+    out[5] = wind
+    out[6] = month
+    out[7] = day
+    out[8] = crop
+    out[9] = mandal
+    out[10] = village
+    # Weather stress indicators
+    out[11] = 1.0 if tmax > 35 else 0.0
+    out[12] = 1.0 if rain < 5 else 0.0
+    out[13] = 1.0 if wind > 20 else 0.0
+    out[14] = tmax - tmin
+    out[15] = (tmax + tmin) / 2
+    return out
+
+def _build_feature_matrix_numba(ndvi, tmin, tmax, humid, rain, wind, month, day, crop, mandal, village):
+    """(N, 16) feature matrix in FEATURE_COLUMNS order, built in one loop over rows"""
+    n = ndvi.shape[0]
+    out = np.empty((n, 16), dtype=np.float64)
+    for i in range(n):
+        out[i, 0] = ndvi[i]
+        out[i, 1] = tmin[i]
+        out[i, 2] = tmax[i]
+        out[i, 3] = humid[i]
+        out[i, 4] = rain[i]
+        out[i, 5] = wind[i]
+        out[i, 6] = month[i]
+        out[i, 7] = day[i]
+        out[i, 8] = crop[i]
+        out[i, 9] = mandal[i]
+        out[i, 10] = village[i]
+        out[i, 11] = 1.0 if tmax[i] > 35 else 0.0
+        out[i, 12] = 1.0 if rain[i] < 5 else 0.0
+        out[i, 13] = 1.0 if wind[i] > 20 else 0.0
+        out[i, 14] = tmax[i] - tmin[i]
+        out[i, 15] = (tmax[i] + tmin[i]) / 2
+    return out
+
+def _build_feature_matrix_numpy(ndvi, tmin, tmax, humid, rain, wind, month, day, crop, mandal, village):
+    """NumPy fallback for build_feature_matrix"""
+    out = np.empty((len(ndvi), 16), dtype=np.float64)
+    out[:, :11] = np.column_stack((ndvi, tmin, tmax, humid, rain, wind, month, day, crop, mandal, village))
+    # All three stress flags from one (N, 3) compare; rainfall is negated
+    # so that "rain < 5" reads as "-rain > -5" like the other two
+    out[:, 11:14] = np.column_stack((tmax, rain, wind)) * STRESS_SIGNS > STRESS_THRESHOLDS
+    out[:, 14] = out[:, 2] - out[:, 1]
+    out[:, 15] = (out[:, 2] + out[:, 1]) / 2
+    return out
+
+if NUMBA_AVAILABLE:
+    build_feature_row = njit(cache=True)(build_feature_row)
+    # Serial on purpose: numba's parallel thread pool does not survive the
+    # fork of the trainer's worker processes, and the data is a few hundred rows
+    build_feature_matrix = njit(cache=True)(_build_feature_matrix_numba)
+else:
+    build_feature_matrix = _build_feature_matrix_numpy
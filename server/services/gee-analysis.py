@@ -1,18 +1,30 @@
 try:
-    import ee
-    EE_AVAILABLE = True
+    import orjson
+    ORJSON_AVAILABLE = True
 except ImportError:
-    EE_AVAILABLE = False
+    ORJSON_AVAILABLE = False
 
 import json
 import sys
 import os
 import random
+import shutil
+import functools
+import hashlib
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from csv_offline_analysis import analyze_crop_loss_offline
 
-# Initialize Earth Engine if available
-if EE_AVAILABLE:
+# Earth Engine is imported and initialized on first use so the offline and
+# simulation paths do not pay for it at startup
+@functools.lru_cache(maxsize=1)
+def earth_engine_available():
+    """Import and initialize Earth Engine once; returns False if unavailable"""
+    try:
+        import ee
+    except ImportError:
+        return False
+    
     try:
         # Check for environment variables first
         service_account = os.getenv('GOOGLE_EARTH_ENGINE_SERVICE_ACCOUNT_EMAIL')
@@ -48,12 +60,18 @@ if EE_AVAILABLE:
                 # Default initialization
                 ee.Initialize()
                 print("Google Earth Engine initialized with default credentials", file=sys.stderr)
+        return True
     except Exception as e:
-        EE_AVAILABLE = False
         print(f"Earth Engine initialization failed: {e}", file=sys.stderr)
+        return False
+
+# Shared pool for overlapping Earth Engine network calls
+EE_EXECUTOR = ThreadPoolExecutor(max_workers=4)
 
 def analyze_crop_loss_real_time(latitude, longitude, crop_type, field_area):
     """Analyze crop loss using real-time Sentinel-2 satellite imagery"""
+    import ee
+    
     try:
         # Create area of interest
         point = ee.Geometry.Point([longitude, latitude])
@@ -66,19 +84,20 @@ def analyze_crop_loss_real_time(latitude, longitude, crop_type, field_area):
         end_date_before = end_date - timedelta(days=60)
         
         # Get Sentinel-2 Surface Reflectance collections
-        s2_before = (ee.ImageCollection('COPERNICUS/S2_SR')
+        before_collection = (ee.ImageCollection('COPERNICUS/S2_SR')
                     .filterBounds(region)
                     .filterDate(start_date_before.strftime('%Y-%m-%d'), 
                                end_date_before.strftime('%Y-%m-%d'))
-                    .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
-                    .median())
+                    .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20)))
         
-        s2_current = (ee.ImageCollection('COPERNICUS/S2_SR')
+        current_collection = (ee.ImageCollection('COPERNICUS/S2_SR')
                      .filterBounds(region)
                      .filterDate(start_date_current.strftime('%Y-%m-%d'), 
                                 end_date.strftime('%Y-%m-%d'))
-                     .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
-                     .median())
+                     .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20)))
+        
+        s2_before = before_collection.median()
+        s2_current = current_collection.median()
         
         # Calculate NDVI for both periods
         def calculate_ndvi(image):
@@ -89,29 +108,66 @@ def analyze_crop_loss_real_time(latitude, longitude, crop_type, field_area):
         ndvi_current = calculate_ndvi(s2_current)
         
         # Get NDVI values for the specific region
-        ndvi_before_value = ndvi_before.reduceRegion(
+        before_stats = ndvi_before.reduceRegion(
             reducer=ee.Reducer.mean(),
             geometry=region,
             scale=10,
             maxPixels=1e9
-        ).getInfo()['NDVI']
+        )
         
-        ndvi_current_value = ndvi_current.reduceRegion(
+        current_stats = ndvi_current.reduceRegion(
             reducer=ee.Reducer.mean(),
             geometry=region,
             scale=10,
             maxPixels=1e9
-        ).getInfo()['NDVI']
+        )
+        
+        # Calculate loss percentage server-side from the regional means
+        before_mean = ee.Number(before_stats.get('NDVI'))
+        current_mean = ee.Number(current_stats.get('NDVI'))
+        loss = ee.Algorithms.If(
+            before_mean.gt(0),
+            before_mean.subtract(current_mean).divide(before_mean).multiply(100).max(0),
+            0
+        )
+        
+        # Bundle every server-side value into one dictionary so a single
+        # getInfo() round trip fetches them all
+        payload = ee.Dictionary({
+            'ndvi_before': before_mean,
+            'ndvi_current': current_mean,
+            'loss_percentage': loss,
+            'n_before': before_collection.size(),
+            'n_current': current_collection.size()
+        })
+        
+        # Generate actual satellite image URLs with RGB visualization
+        thumb_params = {
+            'region': region,
+            'dimensions': 512,
+            'format': 'png',
+            'bands': ['B4', 'B3', 'B2'],
+            'min': 0,
+            'max': 3000,
+            'gamma': 1.4,
+        }
+        
+        # The stats request and both thumbnail URLs are independent network
+        # calls, so issue them concurrently
+        payload_future = EE_EXECUTOR.submit(payload.getInfo)
+        before_url_future = EE_EXECUTOR.submit(s2_before.getThumbURL, thumb_params)
+        current_url_future = EE_EXECUTOR.submit(s2_current.getThumbURL, thumb_params)
+        payload = payload_future.result()
+        
+        ndvi_before_value = payload.get('ndvi_before')
+        ndvi_current_value = payload.get('ndvi_current')
         
         # Handle null values (no data available)
-        if ndvi_before_value is None or ndvi_current_value is None:
+        if not payload.get('n_before') or not payload.get('n_current') \
+                or ndvi_before_value is None or ndvi_current_value is None:
             raise Exception("No satellite data available for this location and time period")
         
-        # Calculate loss percentage
-        if ndvi_before_value > 0:
-            loss_percentage = max(0, ((ndvi_before_value - ndvi_current_value) / ndvi_before_value) * 100)
-        else:
-            loss_percentage = 0
+        loss_percentage = payload.get('loss_percentage') or 0
         
         # Calculate confidence based on data availability
         confidence = 90 + random.uniform(-5, 5)  # High confidence for real data
@@ -140,28 +196,8 @@ def analyze_crop_loss_real_time(latitude, longitude, crop_type, field_area):
         base_value = crop_values.get(crop_type, 40000)
         estimated_value = affected_area * base_value
         
-        # Generate actual satellite image URLs with RGB visualization
-        visualization_params = {
-            'bands': ['B4', 'B3', 'B2'],
-            'min': 0,
-            'max': 3000,
-            'gamma': 1.4,
-        }
-        
-        # Get actual thumbnail URLs from Earth Engine
-        before_url = s2_before.getThumbURL({
-            'region': region,
-            'dimensions': 512,
-            'format': 'png',
-            **visualization_params
-        })
-        
-        current_url = s2_current.getThumbURL({
-            'region': region,
-            'dimensions': 512,
-            'format': 'png',
-            **visualization_params
-        })
+        before_url = before_url_future.result()
+        current_url = current_url_future.result()
         
         return {
             'success': True,
@@ -189,30 +225,34 @@ def analyze_crop_loss_real_time(latitude, longitude, crop_type, field_area):
 
 def analyze_crop_loss_simulation(latitude, longitude, crop_type, field_area):
     """Simulate crop loss analysis with realistic satellite imagery timing"""
-    # Generate realistic demo data based on location and crop type
-    random.seed(int(latitude * longitude * 1000))
+    import numpy as np
+    
+    # Generate realistic demo data based on location and crop type; every
+    # draw comes from one vectorized call on a location-seeded generator
+    rng = np.random.default_rng(int(latitude * longitude * 1000) & 0xFFFFFFFF)
+    r = rng.random(6)
     
     # Base loss percentage with some randomness
-    base_loss = random.uniform(0, 60)
-    loss_percentage = max(0, min(100, base_loss + random.uniform(-10, 10)))
+    base_loss = r[0] * 60
+    loss_percentage = max(0, min(100, base_loss + (r[1] - 0.5) * 20))
     
     # NDVI values (0.2-0.8 range, current lower than before if loss > 20%)
-    ndvi_before = random.uniform(0.4, 0.8)
+    ndvi_before = 0.4 + r[2] * 0.4
     if loss_percentage > 20:
-        ndvi_current = ndvi_before * (1 - loss_percentage / 100) * random.uniform(0.8, 1.2)
+        ndvi_current = ndvi_before * (1 - loss_percentage / 100) * (0.8 + r[3] * 0.4)
     else:
-        ndvi_current = ndvi_before * random.uniform(0.9, 1.1)
+        ndvi_current = ndvi_before * (0.9 + r[3] * 0.2)
     
     ndvi_current = max(0.1, min(0.9, ndvi_current))
     
     # Confidence based on "data quality"
-    confidence = random.uniform(75, 95)
+    confidence = 75 + r[4] * 20
     
     # Determine damage cause
     damage_cause = "Unknown"
     if loss_percentage > 40:
         causes = ["Severe Drought", "Pest/Disease", "Weather Damage"]
-        damage_cause = random.choice(causes)
+        damage_cause = causes[int(r[5] * len(causes))]
     elif loss_percentage > 20:
         damage_cause = "Moderate Stress"
     
@@ -257,25 +297,106 @@ def analyze_crop_loss_simulation(latitude, longitude, crop_type, field_area):
 
 
 
-def analyze_crop_loss(latitude, longitude, crop_type='rice', field_area=1.0):
-    """Main analysis function that chooses between real-time and offline/simulation"""
+@functools.lru_cache(maxsize=1)
+def load_offline_module():
+    """Import csv-offline-analysis.py by path; its hyphenated name is not importable"""
+    name = 'csv_offline_analysis'
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'csv-offline-analysis.py')
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    # Registered before executing so numba's cache=True can resolve the module
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
+
+# Per-day directories of cached per-hectare results, one JSON file per
+# ~100 m tile and crop; shared by every spawned process
+ANALYSIS_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'analysis_cache')
+
+def _cache_path(latitude, longitude, crop_type):
+    """Cache file for the tile, crop and day of a request"""
+    key = f"{round(latitude, 3):.3f},{round(longitude, 3):.3f},{crop_type}"
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return os.path.join(ANALYSIS_CACHE_DIR, datetime.now().date().isoformat(), digest + '.json')
+
+def _read_cache(path):
+    """Cached result at path, or None on a miss"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_cache(path, result):
+    """Store result atomically; earlier days are dropped since they can no longer hit"""
+    day_dir = os.path.dirname(path)
+    try:
+        if not os.path.isdir(day_dir) and os.path.isdir(ANALYSIS_CACHE_DIR):
+            for name in os.listdir(ANALYSIS_CACHE_DIR):
+                if name != os.path.basename(day_dir):
+                    shutil.rmtree(os.path.join(ANALYSIS_CACHE_DIR, name), ignore_errors=True)
+        os.makedirs(day_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(result, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not write analysis cache: {e}", file=sys.stderr)
+
+def _analyze_per_hectare(latitude, longitude, crop_type):
+    """Run the analysis for one hectare; returns (result, cacheable)"""
+    field_area = 1.0
     # Try real-time analysis first if Earth Engine is available
-    if EE_AVAILABLE:
+    if earth_engine_available():
         try:
-            return analyze_crop_loss_real_time(latitude, longitude, crop_type, field_area)
+            return analyze_crop_loss_real_time(latitude, longitude, crop_type, field_area), True
         except Exception as e:
             print(f"Real-time analysis failed, falling back to offline/simulation: {e}", file=sys.stderr)
     # Try offline CSV analysis if real-time fails or EE not available
-    offline_result = analyze_crop_loss_offline(latitude, longitude, crop_type, field_area)
-    if offline_result.get('success'):
-        return offline_result
-    # Use simulation if offline also fails
-    return analyze_crop_loss_simulation(latitude, longitude, crop_type, field_area)
+    try:
+        offline = load_offline_module()
+    except ImportError as e:
+        print(f"Offline analysis unavailable, falling back to simulation: {e}", file=sys.stderr)
+    else:
+        offline_result = offline.analyze_crop_loss_offline(latitude, longitude, crop_type, field_area)
+        if offline_result.get('success'):
+            return offline_result, True
+    # Use simulation if offline also fails; it is cheap and not worth pinning
+    # for the day in case real data comes back
+    return analyze_crop_loss_simulation(latitude, longitude, crop_type, field_area), False
+
+def analyze_crop_loss(latitude, longitude, crop_type='rice', field_area=1.0):
+    """Main analysis function that chooses between real-time and offline/simulation"""
+    # Results are cached on disk per ~100 m tile and day; field area only
+    # scales the area/value figures, so it is applied outside the cache
+    cache_path = _cache_path(latitude, longitude, crop_type)
+    result = _read_cache(cache_path)
+    if result is None:
+        result, cacheable = _analyze_per_hectare(latitude, longitude, crop_type)
+        if cacheable:
+            _write_cache(cache_path, result)
+    result['affected_area'] = result['affected_area'] * field_area
+    result['estimated_value'] = result['estimated_value'] * field_area
+    return result
+
+def emit_json(obj):
+    """Write obj to stdout as a single JSON line"""
+    if ORJSON_AVAILABLE:
+        sys.stdout.flush()
+        sys.stdout.buffer.write(orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY))
+        sys.stdout.buffer.write(b"\n")
+        sys.stdout.buffer.flush()
+    else:
+        print(json.dumps(obj))
 
 # Main execution
 if __name__ == "__main__":
     if len(sys.argv) != 5:
-        print(json.dumps({"error": "Usage: python gee-analysis.py <latitude> <longitude> <crop_type> <field_area>"}))
+        emit_json({"error": "Usage: python gee-analysis.py <latitude> <longitude> <crop_type> <field_area>"})
         sys.exit(1)
     
     try:
@@ -285,8 +406,8 @@ if __name__ == "__main__":
         field_area = float(sys.argv[4])
         
         result = analyze_crop_loss(latitude, longitude, crop_type, field_area)
-        print(json.dumps(result))
+        emit_json(result)
         
     except Exception as e:
-        print(json.dumps({"error": f"Analysis failed: {str(e)}"}))
+        emit_json({"error": f"Analysis failed: {str(e)}"})
         sys.exit(1)
\ No newline at end of file
@@ -4,9 +4,7 @@ Offline Crop Loss Prediction Model Trainer
 Trains ML model on CSV data for coordinate-based predictions
 """
 
-import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.metrics import mean_squared_error, r2_score
@@ -16,6 +14,11 @@ import os
 import sys
 from datetime import datetime
 
+from features_kernel import FEATURE_COLUMNS, build_feature_matrix, normalized_importances
+from training_utils import (
+    JOBLIB_COMPRESS, LIGHTGBM_AVAILABLE, fit_category_encoder, fit_forest_parallel, lgb, read_csv_fast
+)
+
 class CropLossTrainer:
     def __init__(self, csv_path):
         self.csv_path = csv_path
@@ -29,39 +32,30 @@ class CropLossTrainer:
     def load_and_prepare_data(self):
         """Load CSV data and prepare features"""
         print("Loading CSV data...")
-        df = pd.read_csv(self.csv_path)
-        
-        # Convert date to datetime and extract features
-        df['Date'] = pd.to_datetime(df['Date'])
-        df['Month'] = df['Date'].dt.month
-        df['Day'] = df['Date'].dt.day
+        df = read_csv_fast(self.csv_path, parse_dates=['Date'])
         
         # Encode categorical variables
-        df['Crop_Encoded'] = self.crop_encoder.fit_transform(df['Crop_Variety'])
-        df['Mandal_Encoded'] = self.mandal_encoder.fit_transform(df['Mandal'])
-        df['Village_Encoded'] = self.village_encoder.fit_transform(df['Village'])
-        
-        # Calculate crop loss based on NDVI decline
-        # Lower NDVI indicates higher crop stress/loss
-        df['Crop_Loss_Percentage'] = np.maximum(0, (0.8 - df['NDVI_Value']) * 100)
-        
-        # Add weather stress indicators
-        df['Heat_Stress'] = (df['Temperature_Max_C'] > 35).astype(int)
-        df['Drought_Stress'] = (df['Rainfall_mm'] < 5).astype(int)
-        df['High_Wind_Stress'] = (df['Wind_Speed_kmh'] > 20).astype(int)
-        
-        # Feature engineering
-        df['Temp_Range'] = df['Temperature_Max_C'] - df['Temperature_Min_C']
-        df['Avg_Temp'] = (df['Temperature_Max_C'] + df['Temperature_Min_C']) / 2
-        
-        # Define feature columns
-        self.feature_columns = [
-            'NDVI_Value', 'Temperature_Min_C', 'Temperature_Max_C', 
-            'Humidity_Percent', 'Rainfall_mm', 'Wind_Speed_kmh',
-            'Month', 'Day', 'Crop_Encoded', 'Mandal_Encoded', 'Village_Encoded',
-            'Heat_Stress', 'Drought_Stress', 'High_Wind_Stress',
-            'Temp_Range', 'Avg_Temp'
-        ]
+        df['Crop_Encoded'], self.crop_encoder = fit_category_encoder(df['Crop_Variety'])
+        df['Mandal_Encoded'], self.mandal_encoder = fit_category_encoder(df['Mandal'])
+        df['Village_Encoded'], self.village_encoder = fit_category_encoder(df['Village'])
+        
+        # Every model feature comes out of the shared kernel in one pass
+        date = df['Date'].dt
+        features = build_feature_matrix(
+            df['NDVI_Value'].to_numpy(np.float64), df['Temperature_Min_C'].to_numpy(np.float64),
+            df['Temperature_Max_C'].to_numpy(np.float64), df['Humidity_Percent'].to_numpy(np.float64),
+            df['Rainfall_mm'].to_numpy(np.float64), df['Wind_Speed_kmh'].to_numpy(np.float64),
+            date.month.to_numpy(np.float64), date.day.to_numpy(np.float64),
+            df['Crop_Encoded'].to_numpy(), df['Mandal_Encoded'].to_numpy(), df['Village_Encoded'].to_numpy()
+        )
+        
+        df = df.assign(
+            # Lower NDVI indicates higher crop stress/loss
+            Crop_Loss_Percentage=np.maximum(0, (0.8 - features[:, 0]) * 100),
+            **dict(zip(FEATURE_COLUMNS, features.T))
+        )
+        
+        self.feature_columns = list(FEATURE_COLUMNS)
         
         return df
     
@@ -79,18 +73,37 @@ class CropLossTrainer:
         )
         
         # Scale features
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
-        
-        # Train Random Forest model
-        self.model = RandomForestRegressor(
-            n_estimators=100,
-            max_depth=10,
-            random_state=42,
-            n_jobs=-1
-        )
-        
-        self.model.fit(X_train_scaled, y_train)
+        # The tree learners split on float32 internally, so hand them
+        # contiguous float32 up front instead of a float64 copy
+        X_train_scaled = np.ascontiguousarray(self.scaler.fit_transform(X_train), dtype=np.float32)
+        X_test_scaled = np.ascontiguousarray(self.scaler.transform(X_test), dtype=np.float32)
+        
+        # Histogram-based gradient boosting when LightGBM is installed,
+        # otherwise a Random Forest with the same tree budget
+        if LIGHTGBM_AVAILABLE:
+            self.model = lgb.LGBMRegressor(
+                n_estimators=100,
+                max_depth=10,
+                num_leaves=64,
+                objective='regression',
+                importance_type='gain',
+                random_state=42,
+                n_jobs=-1,
+                verbose=-1
+            )
+            self.model.fit(X_train_scaled, y_train)
+        else:
+            # Prune as hard as validation allows; shallower trees predict faster
+            ccp_alpha = self.select_ccp_alpha(X_train_scaled, y_train)
+            print(f"Using cost-complexity pruning alpha {ccp_alpha}")
+            
+            # Sub-forests are grown in separate processes to sidestep the GIL
+            self.model = fit_forest_parallel(
+                {'max_depth': 10, 'ccp_alpha': ccp_alpha},
+                X_train_scaled, y_train,
+                n_estimators=100,
+                random_state=42
+            )
         
         # Evaluate model
         y_pred = self.model.predict(X_test_scaled)
@@ -104,21 +117,63 @@ class CropLossTrainer:
         return {
             'mse': mse,
             'r2_score': r2,
-            'feature_importance': dict(zip(self.feature_columns, self.model.feature_importances_))
+            'feature_importance': dict(zip(self.feature_columns, normalized_importances(self.model)))
         }
     
+    def select_ccp_alpha(self, X, y, alphas=(0.1, 0.01, 0.001)):
+        """Largest pruning alpha whose validation R2 stays within 1% of the unpruned forest"""
+        X_fit, X_val, y_fit, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
+        
+        unpruned = fit_forest_parallel({'max_depth': 10}, X_fit, y_fit)
+        baseline = r2_score(y_val, unpruned.predict(X_val))
+        
+        for alpha in sorted(alphas, reverse=True):
+            pruned = fit_forest_parallel({'max_depth': 10, 'ccp_alpha': alpha}, X_fit, y_fit)
+            if r2_score(y_val, pruned.predict(X_val)) >= baseline - 0.01 * abs(baseline):
+                return alpha
+        return 0.0
+    
+    def export_onnx(self, output_dir):
+        """Export the fitted model to ONNX for compiled inference, if converters are installed"""
+        try:
+            if LIGHTGBM_AVAILABLE and isinstance(self.model, lgb.LGBMRegressor):
+                from onnxmltools import convert_lightgbm
+                from onnxmltools.convert.common.data_types import FloatTensorType
+                initial_types = [('input', FloatTensorType([None, len(self.feature_columns)]))]
+                onnx_model = convert_lightgbm(self.model, initial_types=initial_types)
+            else:
+                from skl2onnx import convert_sklearn
+                from skl2onnx.common.data_types import FloatTensorType
+                initial_types = [('input', FloatTensorType([None, len(self.feature_columns)]))]
+                onnx_model = convert_sklearn(self.model, initial_types=initial_types)
+        except ImportError:
+            print("ONNX converters not installed, skipping ONNX export")
+            return False
+        except Exception as e:
+            # Converters reject some model/version combinations; the pickled
+            # model is still saved and used without ONNX
+            print(f"ONNX export failed, skipping: {e}")
+            return False
+        
+        # Written aside and moved into place so a failed write never leaves a
+        # partial file that predictors would pick up as newer than the model
+        onnx_path = os.path.join(output_dir, 'crop_loss_model.onnx')
+        tmp_path = onnx_path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(onnx_model.SerializeToString())
+            os.replace(tmp_path, onnx_path)
+        except Exception as e:
+            print(f"ONNX export failed, skipping: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        return True
+    
     def save_model(self, output_dir):
         """Save trained model and encoders"""
         os.makedirs(output_dir, exist_ok=True)
         
-        # Save model
-        joblib.dump(self.model, os.path.join(output_dir, 'crop_loss_model.pkl'))
-        joblib.dump(self.scaler, os.path.join(output_dir, 'scaler.pkl'))
-        joblib.dump(self.crop_encoder, os.path.join(output_dir, 'crop_encoder.pkl'))
-        joblib.dump(self.mandal_encoder, os.path.join(output_dir, 'mandal_encoder.pkl'))
-        joblib.dump(self.village_encoder, os.path.join(output_dir, 'village_encoder.pkl'))
-        
-        # Save metadata
         metadata = {
             'feature_columns': self.feature_columns,
             'crop_classes': self.crop_encoder.classes_.tolist(),
@@ -127,6 +182,20 @@ class CropLossTrainer:
             'trained_at': datetime.now().isoformat()
         }
         
+        # Model, scaler and encoders go into one artifact so the predictor
+        # loads everything with a single read
+        bundle = {
+            'model': self.model,
+            'scaler': self.scaler,
+            'crop_encoder': self.crop_encoder,
+            'mandal_encoder': self.mandal_encoder,
+            'village_encoder': self.village_encoder,
+            'metadata': metadata
+        }
+        joblib.dump(bundle, os.path.join(output_dir, 'bundle.pkl'), compress=JOBLIB_COMPRESS)
+        self.export_onnx(output_dir)
+        
+        # Human-readable copy of the metadata
         with open(os.path.join(output_dir, 'model_metadata.json'), 'w') as f:
             json.dump(metadata, f, indent=2)
         
@@ -1,4 +1,4 @@
-import { spawn } from 'child_process';
+import { spawn, type ChildProcess } from 'child_process';
 import path from 'path';
 import fs from 'fs';
 
@@ -47,6 +47,10 @@ export class OfflineModelService {
   private csvDataPath: string;
   private modelDir: string;
   private isModelTrained = false;
+  private predictorPort = Number(process.env.OFFLINE_PREDICTOR_PORT || 8765);
+  private predictorServer: ChildProcess | null = null;
+  private predictorReady: Promise<void> | null = null;
+  private predictorStopped: Promise<void> = Promise.resolve();
 
   constructor() {
     this.pythonPath = 'python3';
@@ -60,9 +64,10 @@ export class OfflineModelService {
 
   private async initializeModel(): Promise<void> {
     try {
-      const modelPath = path.join(this.modelDir, 'crop_loss_model.pkl');
+      // bundle.pkl is the current layout; crop_loss_model.pkl the older one
+      const modelPaths = ['bundle.pkl', 'crop_loss_model.pkl'].map((name) => path.join(this.modelDir, name));
       
-      if (!fs.existsSync(modelPath)) {
+      if (!modelPaths.some((modelPath) => fs.existsSync(modelPath))) {
         console.log('Training new model from CSV data...');
         await this.trainModel();
       } else {
@@ -113,56 +118,105 @@ export class OfflineModelService {
     });
   }
 
-  private async predictWithModel(input: OfflineModelInput): Promise<any> {
-    return new Promise((resolve, reject) => {
-      if (!this.isModelTrained) {
-        reject(new Error('Model not trained yet'));
-        return;
+  private startPredictorServer(): Promise<void> {
+    if (this.predictorReady) {
+      return this.predictorReady;
+    }
+
+    // A restarted server binds the same port, so wait for the previous one to exit
+    const ready: Promise<void> = this.predictorStopped.then(() => {
+      if (this.predictorReady !== ready) {
+        throw new Error('Prediction server was stopped before it started');
       }
+      return this.spawnPredictorServer();
+    });
+    this.predictorReady = ready;
+    return ready;
+  }
 
-      const args = [
+  private spawnPredictorServer(): Promise<void> {
+    return new Promise((resolve, reject) => {
+      // stdin stays open for the server's lifetime; it exits when the pipe
+      // closes, so a server outliving this process cannot hold the port
+      const server = spawn(this.pythonPath, [
         this.predictorPath,
         '--model-dir', this.modelDir,
-        '--latitude', input.latitude.toString(),
-        '--longitude', input.longitude.toString(),
-        '--crop', input.cropType || 'Rice',
-        '--ndvi', (input.ndviCurrent || 0.5).toString()
-      ];
-
-      const process = spawn(this.pythonPath, args, {
+        '--serve',
+        '--port', this.predictorPort.toString(),
+        '--exit-on-stdin-eof'
+      ], {
         stdio: ['pipe', 'pipe', 'pipe']
       });
 
-      let output = '';
       let errorOutput = '';
 
-      process.stdout.on('data', (data) => {
-        output += data.toString();
+      server.stdout.on('data', (data) => {
+        if (data.toString().includes('Serving predictions')) {
+          resolve();
+        }
       });
 
-      process.stderr.on('data', (data) => {
-        errorOutput += data.toString();
+      server.stderr.on('data', (data) => {
+        // The server logs every request to stderr; keep only the tail for error reports
+        errorOutput = (errorOutput + data.toString()).slice(-4096);
       });
 
-      process.on('close', (code) => {
-        if (code === 0) {
-          try {
-            const result = JSON.parse(output);
-            resolve(result);
-          } catch (error) {
-            reject(new Error(`Failed to parse prediction result: ${error}`));
-          }
-        } else {
-          reject(new Error(`Prediction failed with code ${code}: ${errorOutput}`));
+      // Handlers of a replaced server must not clear its successor
+      server.on('exit', (code) => {
+        if (this.predictorServer === server) {
+          this.predictorServer = null;
+          this.predictorReady = null;
         }
+        reject(new Error(`Prediction server exited with code ${code}: ${errorOutput}`));
       });
 
-      process.on('error', (error) => {
-        reject(new Error(`Failed to start prediction process: ${error.message}`));
+      server.on('error', (error) => {
+        if (this.predictorServer === server) {
+          this.predictorServer = null;
+          this.predictorReady = null;
+        }
+        reject(new Error(`Failed to start prediction server: ${error.message}`));
       });
+
+      this.predictorServer = server;
     });
   }
 
+  private stopPredictorServer(): void {
+    const server = this.predictorServer;
+    this.predictorServer = null;
+    this.predictorReady = null;
+    if (server && server.pid !== undefined && server.exitCode === null && server.signalCode === null) {
+      this.predictorStopped = new Promise((resolve) => server.once('exit', () => resolve()));
+      server.kill();
+    }
+  }
+
+  private async predictWithModel(input: OfflineModelInput): Promise<any> {
+    if (!this.isModelTrained) {
+      throw new Error('Model not trained yet');
+    }
+
+    await this.startPredictorServer();
+
+    const response = await fetch(`http://127.0.0.1:${this.predictorPort}/predict`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        latitude: input.latitude,
+        longitude: input.longitude,
+        crop_variety: input.cropType || 'Rice',
+        ndvi_value: input.ndviCurrent || 0.5
+      })
+    });
+
+    if (!response.ok) {
+      throw new Error(`Prediction failed with status ${response.status}: ${await response.text()}`);
+    }
+
+    return response.json();
+  }
+
   async predictFromCoordinates(input: OfflineModelInput): Promise<OfflineModelResult> {
     try {
       if (!this.isModelTrained) {
@@ -264,6 +318,8 @@ export class OfflineModelService {
     try {
       console.log('Retraining model...');
       await this.trainModel();
+      // Restart the prediction server so it picks up the new model
+      this.stopPredictorServer();
       return { success: true };
     } catch (error) {
       return {
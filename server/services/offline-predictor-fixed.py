@@ -13,7 +13,16 @@ import sys
 from datetime import datetime
 import argparse
 
-class OfflineCropPredictor:
+from features_kernel import FEATURE_COLUMNS, build_feature_row, normalized_importances
+from predictor_utils import BatchPredictorMixin, serve
+
+try:
+    import onnxruntime as ort
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+class OfflineCropPredictor(BatchPredictorMixin):
     def __init__(self, model_dir):
         self.model_dir = model_dir
         self.model = None
@@ -22,19 +31,70 @@ class OfflineCropPredictor:
         self.mandal_encoder = None
         self.village_encoder = None
         self.metadata = None
+        self._mean = None
+        self._inv_scale = None
+        self._onnx_session = None
+        self._onnx_input = None
+        self._feature_columns = ()
+        self._feature_order = None
+        self._importance = None
+        self._crop_map = {}
+        self._mandal_map = {}
+        self._village_map = {}
         self.load_model()
     
     def load_model(self):
         """Load trained model and encoders"""
         try:
-            self.model = joblib.load(os.path.join(self.model_dir, 'crop_loss_model.pkl'))
-            self.scaler = joblib.load(os.path.join(self.model_dir, 'scaler.pkl'))
-            self.crop_encoder = joblib.load(os.path.join(self.model_dir, 'crop_encoder.pkl'))
-            self.mandal_encoder = joblib.load(os.path.join(self.model_dir, 'mandal_encoder.pkl'))
-            self.village_encoder = joblib.load(os.path.join(self.model_dir, 'village_encoder.pkl'))
-            
-            with open(os.path.join(self.model_dir, 'model_metadata.json'), 'r') as f:
-                self.metadata = json.load(f)
+            model_path = os.path.join(self.model_dir, 'bundle.pkl')
+            if os.path.exists(model_path):
+                bundle = joblib.load(model_path)
+                self.model = bundle['model']
+                self.scaler = bundle['scaler']
+                self.crop_encoder = bundle['crop_encoder']
+                self.mandal_encoder = bundle['mandal_encoder']
+                self.village_encoder = bundle['village_encoder']
+                self.metadata = bundle['metadata']
+            else:
+                # Models trained before bundling keep one file per artifact
+                model_path = os.path.join(self.model_dir, 'crop_loss_model.pkl')
+                self.model = joblib.load(model_path)
+                self.scaler = joblib.load(os.path.join(self.model_dir, 'scaler.pkl'))
+                self.crop_encoder = joblib.load(os.path.join(self.model_dir, 'crop_encoder.pkl'))
+                self.mandal_encoder = joblib.load(os.path.join(self.model_dir, 'mandal_encoder.pkl'))
+                self.village_encoder = joblib.load(os.path.join(self.model_dir, 'village_encoder.pkl'))
+                with open(os.path.join(self.model_dir, 'model_metadata.json'), 'r') as f:
+                    self.metadata = json.load(f)
+            
+            # Prefer the compiled ONNX export of the same model for inference
+            onnx_path = os.path.join(self.model_dir, 'crop_loss_model.onnx')
+            if ONNX_AVAILABLE and os.path.exists(onnx_path) and os.path.getmtime(onnx_path) >= os.path.getmtime(model_path):
+                self._onnx_session = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider'])
+                self._onnx_input = self._onnx_session.get_inputs()[0].name
+            
+            # Category -> code lookups, built once from the encoder classes
+            self._crop_map = {cls: i for i, cls in enumerate(self.crop_encoder.classes_.tolist())}
+            self._mandal_map = {cls: i for i, cls in enumerate(self.mandal_encoder.classes_.tolist())}
+            self._village_map = {cls: i for i, cls in enumerate(self.village_encoder.classes_.tolist())}
+            
+            # Standardization as a precomputed affine map; avoids per-call
+            # sklearn validation in transform()
+            self._mean = self.scaler.mean_.astype(np.float32)
+            self._inv_scale = (1.0 / self.scaler.scale_).astype(np.float32)
+            
+            # Only models with a non-standard column order need the row permuted
+            self._feature_columns = tuple(self.metadata['feature_columns'])
+            order = [FEATURE_COLUMNS.index(col) for col in self._feature_columns]
+            if order != list(range(len(FEATURE_COLUMNS))):
+                self._feature_order = np.array(order)
+            
+            # The model is immutable once loaded, so its explanation is too
+            self._importance = {
+                col: float(imp) for col, imp in zip(
+                    self._feature_columns,
+                    normalized_importances(self.model)
+                )
+            }
                 
             print("Model loaded successfully")
         except Exception as e:
@@ -44,86 +104,10 @@ class OfflineCropPredictor:
     def predict_crop_loss(self, input_data):
         """Predict crop loss percentage"""
         try:
-            # Prepare input features
-            features = {}
-            
-            # Basic weather features
-            features['NDVI_Value'] = float(input_data.get('ndvi_value', 0.5))
-            features['Temperature_Min_C'] = float(input_data.get('temp_min', 22.0))
-            features['Temperature_Max_C'] = float(input_data.get('temp_max', 30.0))
-            features['Humidity_Percent'] = float(input_data.get('humidity', 75.0))
-            features['Rainfall_mm'] = float(input_data.get('rainfall', 10.0))
-            features['Wind_Speed_kmh'] = float(input_data.get('wind_speed', 15.0))
-            
-            # Date features
-            current_date = datetime.now()
-            features['Month'] = int(input_data.get('month', current_date.month))
-            features['Day'] = int(input_data.get('day', current_date.day))
-            
-            # Encode categorical variables
-            crop_variety = input_data.get('crop_variety', 'Rice')
-            mandal = input_data.get('mandal', 'Abdullapurmet')
-            village = input_data.get('village', 'Abdullapur')
-            
-            # Handle unknown categories
-            try:
-                features['Crop_Encoded'] = int(self.crop_encoder.transform([crop_variety])[0])
-            except ValueError:
-                features['Crop_Encoded'] = 0
-            
-            try:
-                features['Mandal_Encoded'] = int(self.mandal_encoder.transform([mandal])[0])
-            except ValueError:
-                features['Mandal_Encoded'] = 0
-            
-            try:
-                features['Village_Encoded'] = int(self.village_encoder.transform([village])[0])
-            except ValueError:
-                features['Village_Encoded'] = 0
-            
-            # Calculate stress indicators
-            features['Heat_Stress'] = 1 if features['Temperature_Max_C'] > 35 else 0
-            features['Drought_Stress'] = 1 if features['Rainfall_mm'] < 5 else 0
-            features['High_Wind_Stress'] = 1 if features['Wind_Speed_kmh'] > 20 else 0
-            
-            # Additional features
-            features['Temp_Range'] = features['Temperature_Max_C'] - features['Temperature_Min_C']
-            features['Avg_Temp'] = (features['Temperature_Max_C'] + features['Temperature_Min_C']) / 2
-            
-            # Create feature array
-            feature_array = np.array([features[col] for col in self.metadata['feature_columns']]).reshape(1, -1)
-            
-            # Scale features
-            feature_array_scaled = self.scaler.transform(feature_array)
-            
-            # Predict
-            prediction = float(self.model.predict(feature_array_scaled)[0])
-            
-            # Get feature importance for explanation
-            feature_importance = {
-                col: float(imp) for col, imp in zip(
-                    self.metadata['feature_columns'], 
-                    self.model.feature_importances_
-                )
-            }
-            
-            # Convert all numpy types to Python native types
-            clean_features = {}
-            for k, v in features.items():
-                if isinstance(v, (np.integer, np.int64, np.int32)):
-                    clean_features[k] = int(v)
-                elif isinstance(v, (np.floating, np.float64, np.float32)):
-                    clean_features[k] = float(v)
-                else:
-                    clean_features[k] = v
-            
-            return {
-                'predicted_loss_percentage': max(0.0, min(100.0, prediction)),
-                'confidence': min(95.0, 70.0 + abs(features['NDVI_Value'] - 0.5) * 50),
-                'risk_level': 'High' if prediction > 30 else 'Medium' if prediction > 15 else 'Low',
-                'feature_importance': feature_importance,
-                'input_features': clean_features
-            }
+            # Stress indicators and derived features are computed in the kernel
+            row = build_feature_row(*self._parse_input(input_data, datetime.now()))
+            prediction = float(self._predict_rows(row.reshape(1, -1))[0])
+            return self._result(row, prediction)
             
         except Exception as e:
             return {'error': f'Prediction failed: {str(e)}'}
@@ -131,8 +115,8 @@ class OfflineCropPredictor:
 def main():
     parser = argparse.ArgumentParser(description='Predict crop loss using trained model')
     parser.add_argument('--model-dir', required=True, help='Directory containing trained model')
-    parser.add_argument('--latitude', type=float, required=True, help='Latitude coordinate')
-    parser.add_argument('--longitude', type=float, required=True, help='Longitude coordinate')
+    parser.add_argument('--latitude', type=float, help='Latitude coordinate')
+    parser.add_argument('--longitude', type=float, help='Longitude coordinate')
     parser.add_argument('--crop', default='Rice', help='Crop variety')
     parser.add_argument('--ndvi', type=float, default=0.5, help='NDVI value')
     parser.add_argument('--temp-min', type=float, default=22.0, help='Minimum temperature')
@@ -140,12 +124,22 @@ def main():
     parser.add_argument('--humidity', type=float, default=75.0, help='Humidity percentage')
     parser.add_argument('--rainfall', type=float, default=10.0, help='Rainfall in mm')
     parser.add_argument('--wind-speed', type=float, default=15.0, help='Wind speed in km/h')
+    parser.add_argument('--serve', action='store_true', help='Run as a persistent HTTP prediction server')
+    parser.add_argument('--host', default='127.0.0.1', help='Server bind address')
+    parser.add_argument('--port', type=int, default=8765, help='Server port')
+    parser.add_argument('--exit-on-stdin-eof', action='store_true', help='Stop serving when stdin is closed')
     
     args = parser.parse_args()
+    if not args.serve and (args.latitude is None or args.longitude is None):
+        parser.error('--latitude and --longitude are required unless --serve is given')
     
     # Initialize predictor
     predictor = OfflineCropPredictor(args.model_dir)
     
+    if args.serve:
+        serve(predictor, args.host, args.port, args.exit_on_stdin_eof)
+        return
+    
     # Prepare input data
     input_data = {
         'latitude': args.latitude,
@@ -0,0 +1,33 @@
+"""
+Single-row crop loss scoring for the offline CSV analysis.
+
+This is plain Python and works as-is. For a native build, compile it ahead of
+time with `pythran offline_score.py`; the resulting extension module sits next
+to this file and is imported in preference to it.
+"""
+
+#pythran export score_row(float, float, float, float, int, float, float)
+def score_row(ndvi, temp_max, rainfall, humidity, age_days, field_area, base_value):
+    """Return (loss %, confidence, affected area, estimated value, damage level 0-3)"""
+    healthy_ndvi_threshold = 0.6
+    loss = max(0.0, (healthy_ndvi_threshold - ndvi) / healthy_ndvi_threshold * 100)
+    if temp_max > 35:
+        loss += 5
+    if rainfall < 10:
+        loss += 5
+    if humidity < 30:
+        loss += 3
+    loss = min(loss, 100.0)
+
+    confidence = 80.0 + (5 - abs(age_days))  # Adjust confidence by data recency
+
+    level = 0
+    if loss > 40:
+        level = 3
+    elif loss > 25:
+        level = 2
+    elif loss > 10:
+        level = 1
+
+    affected_area = field_area * (loss / 100)
+    return loss, confidence, affected_area, affected_area * base_value, level
@@ -0,0 +1,155 @@
+"""
+Inference helpers shared by the offline crop loss predictors
+(offline-predictor.py and offline-predictor-fixed.py): batched feature
+rows, scaling, response building and the persistent HTTP server.
+"""
+
+import json
+import sys
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from features_kernel import FEATURE_COLUMNS, build_feature_matrix
+
+class BatchPredictorMixin:
+    """Feature parsing and batched prediction over a loaded model.
+
+    Expects the class to set the category maps, the scaler affine
+    (_mean, _inv_scale), _feature_order, _importance and either model or
+    _onnx_session when loading.
+    """
+
+    def _parse_input(self, input_data, current_date):
+        """Parse one input dict into the raw values the feature kernels take"""
+        # Basic weather features
+        ndvi = float(input_data.get('ndvi_value', 0.5))
+        temp_min = float(input_data.get('temp_min', 22.0))
+        temp_max = float(input_data.get('temp_max', 30.0))
+        humidity = float(input_data.get('humidity', 75.0))
+        rainfall = float(input_data.get('rainfall', 10.0))
+        wind_speed = float(input_data.get('wind_speed', 15.0))
+        
+        # Date features
+        month = int(input_data.get('month', current_date.month))
+        day = int(input_data.get('day', current_date.day))
+        
+        # Encode categorical variables
+        crop_variety = input_data.get('crop_variety', 'Rice')
+        mandal = input_data.get('mandal', 'Abdullapurmet')
+        village = input_data.get('village', 'Abdullapur')
+        
+        # Unknown categories default to the first class
+        crop_encoded = self._crop_map.get(crop_variety, 0)
+        mandal_encoded = self._mandal_map.get(mandal, 0)
+        village_encoded = self._village_map.get(village, 0)
+        
+        return (ndvi, temp_min, temp_max, humidity, rainfall, wind_speed,
+                month, day, crop_encoded, mandal_encoded, village_encoded)
+    
+    def _predict_rows(self, rows):
+        """Scale a (B, 16) feature matrix and predict it with one model call"""
+        if self._feature_order is not None:
+            rows = rows[:, self._feature_order]
+        
+        # Scale features
+        rows_scaled = (rows.astype(np.float32) - self._mean) * self._inv_scale
+        
+        # Predict
+        if self._onnx_session is not None:
+            return self._onnx_session.run(None, {self._onnx_input: rows_scaled})[0].ravel()
+        return self.model.predict(rows_scaled)
+    
+    def _result(self, row, prediction):
+        """Build the response dict for one feature row and its prediction"""
+        return {
+            'predicted_loss_percentage': max(0.0, min(100.0, prediction)),
+            'confidence': min(95.0, 70.0 + abs(float(row[0]) - 0.5) * 50),
+            'risk_level': 'High' if prediction > 30 else 'Medium' if prediction > 15 else 'Low',
+            'feature_importance': dict(self._importance),
+            'input_features': dict(zip(FEATURE_COLUMNS, row.tolist()))
+        }
+    
+    def predict_batch(self, inputs):
+        """Predict crop loss for a list of inputs with a single model call"""
+        current_date = datetime.now()
+        results = [None] * len(inputs)
+        
+        # Inputs that fail to parse get an error entry; the rest share one matrix
+        raw = np.empty((len(inputs), 11))
+        positions = []
+        for i, input_data in enumerate(inputs):
+            try:
+                raw[len(positions)] = self._parse_input(input_data, current_date)
+                positions.append(i)
+            except Exception as e:
+                results[i] = {'error': f'Prediction failed: {str(e)}'}
+        
+        if positions:
+            try:
+                rows = build_feature_matrix(*raw[:len(positions)].T)
+                predictions = self._predict_rows(rows).tolist()
+            except Exception as e:
+                for i in positions:
+                    results[i] = {'error': f'Prediction failed: {str(e)}'}
+                return results
+            for i, row, prediction in zip(positions, rows, predictions):
+                results[i] = self._result(row, prediction)
+        
+        return results
+
+def serve(predictor, host='127.0.0.1', port=8765, exit_on_stdin_eof=False):
+    """Serve predictions over HTTP so the model is loaded once per process"""
+    class PredictHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/health':
+                self.send_error(404)
+                return
+            self._reply(200, {'status': 'ok', 'model_loaded': predictor.model is not None})
+
+        def do_POST(self):
+            if self.path != '/predict':
+                self.send_error(404)
+                return
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError as e:
+                self._reply(400, {'error': f'Invalid JSON: {str(e)}'})
+                return
+
+            # A list of inputs is answered with a list of results in the same order
+            if isinstance(payload, list):
+                result = predictor.predict_batch(payload)
+            else:
+                result = predictor.predict_crop_loss(payload)
+            self._reply(200, result)
+
+        def _reply(self, status, body):
+            data = json.dumps(body, default=lambda o: o.item() if hasattr(o, 'item') else str(o)).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            sys.stderr.write(format % args + '\n')
+
+    server = ThreadingHTTPServer((host, port), PredictHandler)
+    if exit_on_stdin_eof:
+        # The parent holds our stdin open; EOF means it has gone away, even if
+        # it was killed without a chance to stop us, so free the port
+        def watch_stdin():
+            sys.stdin.buffer.read()
+            server.shutdown()
+        threading.Thread(target=watch_stdin, daemon=True).start()
+    print(f"Serving predictions on http://{host}:{port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
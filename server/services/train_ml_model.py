@@ -1,22 +1,24 @@
 #!/usr/bin/env python3
 
-import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, r2_score
-from sklearn.preprocessing import LabelEncoder
 import joblib
 import os
 import json
 from datetime import datetime
 
+from features_kernel import normalized_importances
+from training_utils import (
+    JOBLIB_COMPRESS, LIGHTGBM_AVAILABLE, fit_category_encoder, fit_forest_parallel, lgb, read_csv_fast
+)
+
 def load_and_preprocess_data(csv_path):
     """Load CSV data and preprocess it for ML training"""
     print(f"Loading data from {csv_path}...")
     
     # Load the CSV data
-    df = pd.read_csv(csv_path)
+    df = read_csv_fast(csv_path)
     print(f"Loaded {len(df)} records")
     
     # Display basic info about the dataset
@@ -36,42 +38,46 @@ def load_and_preprocess_data(csv_path):
         'longitude'
     ]
     
-    # Handle missing values and -9999 placeholder values
-    for col in feature_columns:
-        if col in df.columns:
-            # Replace -9999 with NaN and then with column mean
-            df[col] = df[col].replace(-9999, np.nan)
-            df[col] = df[col].fillna(df[col].mean())
+    # Handle missing values and -9999 placeholder values in one sweep:
+    # replace -9999 with NaN and then fill each column with its mean
+    present = [col for col in feature_columns if col in df.columns]
+    if present:
+        values = df[present].to_numpy(dtype=np.float64, copy=True)
+        values[values == -9999] = np.nan
+        missing = np.isnan(values)
+        if missing.any():
+            values[missing] = np.nanmean(values, axis=0)[np.nonzero(missing)[1]]
+        df[present] = values
     
     # Create target variable (loss percentage)
     # Use existing loss_percentage if available, otherwise derive from NDVI change
     if 'loss_percentage' in df.columns:
-        df['loss_percentage_target'] = df['loss_percentage']
+        target = df['loss_percentage'].to_numpy(dtype=np.float64, copy=True)
     else:
         # Calculate loss percentage from NDVI percent change
-        df['loss_percentage_target'] = np.abs(df['NDVI_percent_change_mean']).fillna(0)
+        target = df['NDVI_percent_change_mean'].to_numpy(dtype=np.float64, copy=True)
+        np.abs(target, out=target)
+        np.nan_to_num(target, copy=False, nan=0.0)
     
     # Ensure loss percentage is within reasonable bounds
-    df['loss_percentage_target'] = np.clip(df['loss_percentage_target'], 0, 100)
+    np.clip(target, 0, 100, out=target)
+    df['loss_percentage_target'] = target
     
     # Encode categorical variables if they exist
     label_encoders = {}
     if 'vegetation_health' in df.columns:
-        le = LabelEncoder()
-        df['vegetation_health_encoded'] = le.fit_transform(df['vegetation_health'].astype(str))
-        label_encoders['vegetation_health'] = le
+        df['vegetation_health_encoded'], label_encoders['vegetation_health'] = fit_category_encoder(df['vegetation_health'].astype(str))
         feature_columns.append('vegetation_health_encoded')
     
     if 'season' in df.columns:
-        le = LabelEncoder()
-        df['season_encoded'] = le.fit_transform(df['season'].astype(str))
-        label_encoders['season'] = le
+        df['season_encoded'], label_encoders['season'] = fit_category_encoder(df['season'].astype(str))
         feature_columns.append('season_encoded')
     
     # Select final features that are available
     available_features = [col for col in feature_columns if col in df.columns]
     
-    X = df[available_features]
+    # float32 matches what the tree learners use internally and halves the copy
+    X = df[available_features].astype(np.float32)
     y = df['loss_percentage_target']
     
     print(f"\nUsing {len(available_features)} features:")
@@ -81,25 +87,37 @@ def load_and_preprocess_data(csv_path):
     return X, y, available_features, label_encoders
 
 def train_random_forest_model(X, y, feature_names):
-    """Train Random Forest model for crop loss prediction"""
-    print("\nTraining Random Forest model...")
+    """Train the tree ensemble for crop loss prediction"""
+    print(f"\nTraining {'LightGBM' if LIGHTGBM_AVAILABLE else 'Random Forest'} model...")
     
     # Split data
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=42
     )
     
-    # Train Random Forest
-    rf_model = RandomForestRegressor(
-        n_estimators=100,
-        max_depth=10,
-        min_samples_split=5,
-        min_samples_leaf=2,
-        random_state=42,
-        n_jobs=-1
-    )
-    
-    rf_model.fit(X_train, y_train)
+    # Histogram-based gradient boosting when LightGBM is installed,
+    # otherwise a Random Forest with the same tree budget
+    if LIGHTGBM_AVAILABLE:
+        rf_model = lgb.LGBMRegressor(
+            n_estimators=100,
+            max_depth=10,
+            num_leaves=64,
+            min_child_samples=2,
+            objective='regression',
+            importance_type='gain',
+            random_state=42,
+            n_jobs=-1,
+            verbose=-1
+        )
+        rf_model.fit(X_train, y_train)
+    else:
+        # Sub-forests are grown in separate processes to sidestep the GIL
+        rf_model = fit_forest_parallel(
+            {'max_depth': 10, 'min_samples_split': 5, 'min_samples_leaf': 2},
+            X_train, y_train,
+            n_estimators=100,
+            random_state=42
+        )
     
     # Evaluate model
     train_pred = rf_model.predict(X_train)
@@ -117,7 +135,7 @@ def train_random_forest_model(X, y, feature_names):
     print(f"  Test R²: {test_r2:.3f}")
     
     # Feature importance
-    importance_dict = dict(zip(feature_names, rf_model.feature_importances_))
+    importance_dict = dict(zip(feature_names, normalized_importances(rf_model)))
     sorted_importance = sorted(importance_dict.items(), key=lambda x: x[1], reverse=True)
     
     print(f"\nFeature Importance:")
@@ -147,7 +165,7 @@ def save_model(model, feature_names, label_encoders, metrics, model_path='data/c
     os.makedirs(os.path.dirname(model_path), exist_ok=True)
     
     # Save model
-    joblib.dump(model_data, model_path)
+    joblib.dump(model_data, model_path, compress=JOBLIB_COMPRESS)
     print(f"\nModel saved to {model_path}")
     
     # Save model info as JSON
@@ -157,7 +175,7 @@ def save_model(model, feature_names, label_encoders, metrics, model_path='data/c
         'metrics': metrics,
         'training_date': model_data['training_date'],
         'model_version': model_data['model_version'],
-        'model_type': 'RandomForestRegressor'
+        'model_type': type(model).__name__
     }
     
     with open(info_path, 'w') as f:
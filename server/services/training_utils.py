@@ -0,0 +1,77 @@
+"""
+Helpers shared by the crop loss model trainers (offline-crop-trainer.py and
+train_ml_model.py): fast CSV loading, category encoding, parallel Random
+Forest fitting and model persistence settings.
+"""
+
+import pandas as pd
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import LabelEncoder
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+try:
+    import lightgbm as lgb
+    LIGHTGBM_AVAILABLE = True
+except ImportError:
+    lgb = None
+    LIGHTGBM_AVAILABLE = False
+
+try:
+    import pyarrow
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+try:
+    import lz4
+    LZ4_AVAILABLE = True
+except ImportError:
+    LZ4_AVAILABLE = False
+
+# LZ4 decompresses faster than the disk read it saves; zlib would not, so
+# without lz4 the pickles stay uncompressed
+JOBLIB_COMPRESS = ('lz4', 3) if LZ4_AVAILABLE else 0
+
+def read_csv_fast(path, **kwargs):
+    """Read a CSV with pyarrow's multithreaded parser, falling back to the C engine"""
+    if PYARROW_AVAILABLE:
+        try:
+            return pd.read_csv(path, engine='pyarrow', **kwargs)
+        except pd.errors.ParserError:
+            # pyarrow rejects ragged rows that the C engine pads with NaN
+            pass
+    return pd.read_csv(path, **kwargs)
+
+def fit_category_encoder(values):
+    """Encode values in one pass with pd.Categorical; returns the codes and an equivalent fitted LabelEncoder"""
+    cat = pd.Categorical(values)
+    encoder = LabelEncoder()
+    encoder.classes_ = cat.categories.to_numpy()
+    return cat.codes.astype(np.int32), encoder
+
+def _fit_sub_forest(params, n_trees, seed, X, y):
+    """Fit one slice of a Random Forest in a worker process"""
+    forest = RandomForestRegressor(n_estimators=n_trees, random_state=seed, n_jobs=1, **params)
+    return forest.fit(X, y)
+
+def fit_forest_parallel(params, X, y, n_estimators=100, random_state=42):
+    """Fit a Random Forest as per-process sub-forests and merge their trees"""
+    n_workers = min(os.cpu_count() or 1, n_estimators)
+    if n_workers < 2:
+        forest = RandomForestRegressor(n_estimators=n_estimators, random_state=random_state, n_jobs=-1, **params)
+        return forest.fit(X, y)
+
+    counts = [len(chunk) for chunk in np.array_split(np.arange(n_estimators), n_workers)]
+    seeds = np.random.RandomState(random_state).randint(np.iinfo(np.int32).max, size=n_workers)
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        forests = list(pool.map(_fit_sub_forest, repeat(params), counts, seeds.tolist(), repeat(X), repeat(y)))
+
+    forest = forests[0]
+    for other in forests[1:]:
+        forest.estimators_ += other.estimators_
+    forest.n_estimators = len(forest.estimators_)
+    forest.n_jobs = -1
+    return forest
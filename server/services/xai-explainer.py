@@ -8,6 +8,8 @@ import os
 import numpy as np
 from datetime import datetime, timedelta
 
+from features_kernel import normalized_importances
+
 try:
     import joblib
     import pandas as pd
@@ -175,7 +177,8 @@ def predict_with_explanation(ndvi_before, ndvi_current, latitude, longitude, day
             predicted_loss = max(0, min(100, predicted_loss))
             
             # Get feature importance from the trained model
-            feature_importance = trained_model.feature_importances_
+            # Normalized so tree ensembles reporting raw gains (LightGBM) stay comparable
+            feature_importance = normalized_importances(trained_model)
             
             # Create explanations
             explanations = []